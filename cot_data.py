@@ -4,22 +4,31 @@ COT (Commitment of Traders) Data Processing Module
 Handles fetching and processing CFTC COT data for commodity analysis
 """
 
+import io
 import sys
 import json
 import argparse
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import warnings
 warnings.filterwarnings('ignore')
 
-# Import COT library
+from data_io import (
+    get_cache_path, get_cache_key, read_cache, write_cache, read_with_parquet_mirror,
+    serialize_result, write_output, read_last_date, append_csv_rows
+)
+
+# HTTP client for CFTC downloads
 try:
-    from cot_reports import cot_reports as cot
+    import requests
 except ImportError:
     print(json.dumps({
         'success': False,
-        'message': 'cot-reports library not installed'
+        'message': 'requests library not installed'
     }))
     sys.exit(1)
 
@@ -51,6 +60,87 @@ COT_MAPPING = {
     "CT=F": "COTTON NO. 2 - ICE FUTURES U.S.",
 }
 
+# CFTC yearly Disaggregated Futures Only report archive (same source as cot_reports.cot_year)
+COT_YEAR_URL = 'https://cftc.gov/files/dea/history/fut_disagg_txt_{year}.zip'
+COT_DOWNLOAD_TIMEOUT = 60
+COT_YEARS_TO_FETCH = 4
+
+# CFTC report column names mapped to the names stored in COT CSV files
+COT_RENAME_MAP = {
+    'Report_Date_as_YYYY-MM-DD': 'Date',
+    'Open_Interest_All': 'Open_Interest',
+    'M_Money_Positions_Long_All': 'NonComm_Long',
+    'M_Money_Positions_Short_All': 'NonComm_Short',
+    'Prod_Merc_Positions_Long_All': 'Comm_Long',
+    'Prod_Merc_Positions_Short_All': 'Comm_Short',
+}
+
+# Columns stored in COT CSV files and used for metrics
+COT_COLUMNS = ('Date', 'Open_Interest', 'NonComm_Long', 'NonComm_Short',
+               'NonComm_Net', 'Comm_Long', 'Comm_Short', 'Comm_Net')
+
+# Position and open interest counts, stored as int32
+COT_COUNT_DTYPES = {col: 'int32' for col in COT_COLUMNS if col != 'Date'}
+
+# Columns whose week-over-week change is reported, mapped to the change column name
+CHANGE_COLUMNS = {
+    'NonComm_Net': 'NonComm_Net_Change',
+    'Comm_Net': 'Comm_Net_Change',
+    'Open_Interest': 'OI_Change',
+}
+
+
+def load_cot_history(file_path):
+    """
+    Load a COT history file.
+
+    Args:
+        file_path: Path to COT CSV file
+
+    Returns:
+        DataFrame: COT history with a datetime 'Date' column
+    """
+    return read_with_parquet_mirror(file_path, _read_cot_csv)
+
+
+def _read_cot_csv(file_path):
+    """Parse the metric columns of a COT history CSV"""
+    # Only parse the columns used for metrics; tolerate files missing some of them
+    read_kwargs = {
+        'usecols': lambda col: col in COT_COLUMNS,
+        'parse_dates': ['Date'],
+        'engine': 'c',
+        'memory_map': True,
+    }
+    try:
+        return pd.read_csv(file_path, dtype=COT_COUNT_DTYPES, **read_kwargs)
+    except ValueError:
+        # Files with missing counts can't be read as int32
+        return pd.read_csv(file_path, **read_kwargs)
+
+
+def download_cot_year(year):
+    """
+    Download one year of the CFTC Disaggregated Futures Only report.
+
+    The archive is unpacked in memory rather than into the working directory,
+    so several years can be downloaded concurrently.
+
+    Args:
+        year: Report year (int)
+
+    Returns:
+        DataFrame: Raw report rows for all markets in that year
+    """
+    response = requests.get(COT_YEAR_URL.format(year=year), timeout=COT_DOWNLOAD_TIMEOUT)
+    response.raise_for_status()
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        txt_name = next(name for name in archive.namelist() if name.lower().endswith('.txt'))
+        with archive.open(txt_name) as f:
+            # Parse market names straight into a categorical so filtering compares int codes
+            return pd.read_csv(f, low_memory=False, dtype={'Market_and_Exchange_Names': 'category'})
+
 
 def fetch_cot_data(symbol, file_path):
     """
@@ -76,13 +166,15 @@ def fetch_cot_data(symbol, file_path):
 
         # Determine which years to fetch
         current_year = datetime.now().year
-        years_to_fetch = [current_year, current_year - 1, current_year - 2, current_year - 3]
+        years_to_fetch = [current_year - offset for offset in range(COT_YEARS_TO_FETCH)]
 
         # Check existing data
+        last_date = None
         if file_path.exists() and file_path.stat().st_size > 0:
-            existing_df = pd.read_csv(file_path, parse_dates=['Date'])
-            last_date = existing_df['Date'].max()
+            # Read only the end of the file to find the last date
+            last_date = read_last_date(file_path)
 
+        if last_date is not None:
             # Check if data is current (COT is weekly, published Fridays)
             days_old = (datetime.now() - last_date).days
             if days_old < 7:
@@ -92,28 +184,33 @@ def fetch_cot_data(symbol, file_path):
                     'rows_added': 0,
                     'last_date': last_date.strftime('%Y-%m-%d')
                 }
-        else:
-            existing_df = None
 
-        # Fetch data for the last 4 years
+        # Fetch data for the last 4 years concurrently (downloads are network-bound)
+        year_dfs = {}
+        with ThreadPoolExecutor(max_workers=len(years_to_fetch)) as executor:
+            futures = {executor.submit(download_cot_year, year): year for year in years_to_fetch}
+            for future in as_completed(futures):
+                try:
+                    year_dfs[futures[future]] = future.result()
+                except Exception as e:
+                    # Skip years that fail (e.g., future years)
+                    continue
+
         all_data = []
         for year in years_to_fetch:
-            try:
-                year_df = cot.cot_year(
-                    year=year,
-                    cot_report_type='disaggregated_fut',
-                    store_txt=False,
-                    verbose=False
-                )
-
-                # Filter for our specific commodity
-                commodity_df = year_df[year_df['Market_and_Exchange_Names'] == cot_name].copy()
-
-                if not commodity_df.empty:
-                    all_data.append(commodity_df)
-            except Exception as e:
-                # Skip years that fail (e.g., future years)
+            if year not in year_dfs:
+                continue
+            year_df = year_dfs[year]
+
+            # Filter for our specific commodity
+            markets = year_df['Market_and_Exchange_Names']
+            if cot_name not in markets.cat.categories:
                 continue
+            mask = markets.cat.codes.to_numpy() == markets.cat.categories.get_loc(cot_name)
+            commodity_df = year_df[mask].copy()
+
+            if not commodity_df.empty:
+                all_data.append(commodity_df)
 
         if not all_data:
             return {
@@ -121,36 +218,32 @@ def fetch_cot_data(symbol, file_path):
                 'message': f'No COT data found for {cot_name}'
             }
 
-        # Combine all years
+        # Combine all years. CFTC files list the newest reports first and years are
+        # fetched newest first, so the combined frame is normally just reversed order.
         cot_df = pd.concat(all_data, ignore_index=True)
-        cot_df = cot_df.sort_values('Report_Date_as_YYYY-MM-DD')
+        report_dates = cot_df['Report_Date_as_YYYY-MM-DD']
+        if not report_dates.is_monotonic_increasing:
+            if report_dates.is_monotonic_decreasing:
+                cot_df = cot_df.iloc[::-1].reset_index(drop=True)
+            else:
+                cot_df = cot_df.sort_values('Report_Date_as_YYYY-MM-DD', kind='stable')
 
         # Rename columns for consistency
-        cot_df = cot_df.rename(columns={
-            'Report_Date_as_YYYY-MM-DD': 'Date',
-            'Open_Interest_All': 'Open_Interest',
-            'M_Money_Positions_Long_All': 'NonComm_Long',
-            'M_Money_Positions_Short_All': 'NonComm_Short',
-            'Prod_Merc_Positions_Long_All': 'Comm_Long',
-            'Prod_Merc_Positions_Short_All': 'Comm_Short',
-        })
+        cot_df = cot_df.rename(columns=COT_RENAME_MAP)
 
         # Calculate net positions
         cot_df['NonComm_Net'] = cot_df['NonComm_Long'] - cot_df['NonComm_Short']
         cot_df['Comm_Net'] = cot_df['Comm_Long'] - cot_df['Comm_Short']
 
         # Select columns to save
-        cols_to_save = ['Date', 'Open_Interest', 'NonComm_Long', 'NonComm_Short',
-                        'NonComm_Net', 'Comm_Long', 'Comm_Short', 'Comm_Net']
-        cot_df = cot_df[cols_to_save]
+        cot_df = cot_df[list(COT_COLUMNS)]
 
         # Convert Date to datetime if it isn't already
         if not pd.api.types.is_datetime64_any_dtype(cot_df['Date']):
             cot_df['Date'] = pd.to_datetime(cot_df['Date'])
 
         # Filter out data we already have
-        if existing_df is not None:
-            last_date = existing_df['Date'].max()
+        if last_date is not None:
             cot_df = cot_df[cot_df['Date'] > last_date]
 
             if cot_df.empty:
@@ -162,7 +255,7 @@ def fetch_cot_data(symbol, file_path):
                 }
 
             # Append to existing file
-            cot_df.to_csv(file_path, mode='a', header=False, index=False)
+            append_csv_rows(cot_df, file_path)
             rows_added = len(cot_df)
         else:
             # Save new file
@@ -204,7 +297,7 @@ def calculate_cot_metrics(file_path, years=1):
                 'message': 'COT data file not found. Please fetch data first.'
             }
 
-        df = pd.read_csv(file_path, parse_dates=['Date'])
+        df = load_cot_history(file_path)
         df = df.sort_values('Date')
 
         # Filter by date range based on years parameter
@@ -217,31 +310,36 @@ def calculate_cot_metrics(file_path, years=1):
                 'message': f'No data available for the last {years} year(s)'
             }
 
-        # Calculate week-over-week changes
-        df['NonComm_Net_Change'] = df['NonComm_Net'].diff() if 'NonComm_Net' in df.columns else None
-        df['Comm_Net_Change'] = df['Comm_Net'].diff() if 'Comm_Net' in df.columns else None
-        df['OI_Change'] = df['Open_Interest'].diff()
+        # Calculate week-over-week changes in a single diff over all change columns
+        change_cols = [col for col in CHANGE_COLUMNS if col in df.columns]
+        changes = df[change_cols].diff()
+        changes.columns = [CHANGE_COLUMNS[col] for col in change_cols]
+        df = df.join(changes)
 
         # Convert NaN to None for JSON serialization
-        def safe_list(series):
-            if series is None or series.name not in df.columns:
+        def safe_list(column):
+            if column not in df.columns:
                 return []
-            return [None if pd.isna(x) else x for x in series]
+            series = df[column]
+            missing = series.isna()
+            if not missing.any():
+                return series.tolist()
+            return series.astype(object).where(~missing, None).tolist()
 
         # Prepare data for frontend
         data = {
             'success': True,
-            'dates': df['Date'].dt.strftime('%Y-%m-%d').tolist(),
-            'open_interest': safe_list(df['Open_Interest']),
-            'noncomm_net': safe_list(df.get('NonComm_Net')),
-            'comm_net': safe_list(df.get('Comm_Net')),
-            'noncomm_long': safe_list(df.get('NonComm_Long')),
-            'noncomm_short': safe_list(df.get('NonComm_Short')),
-            'comm_long': safe_list(df.get('Comm_Long')),
-            'comm_short': safe_list(df.get('Comm_Short')),
-            'noncomm_net_change': safe_list(df.get('NonComm_Net_Change')),
-            'comm_net_change': safe_list(df.get('Comm_Net_Change')),
-            'oi_change': safe_list(df.get('OI_Change')),
+            'dates': np.datetime_as_string(df['Date'].to_numpy(dtype='datetime64[D]'), unit='D').tolist(),
+            'open_interest': safe_list('Open_Interest'),
+            'noncomm_net': safe_list('NonComm_Net'),
+            'comm_net': safe_list('Comm_Net'),
+            'noncomm_long': safe_list('NonComm_Long'),
+            'noncomm_short': safe_list('NonComm_Short'),
+            'comm_long': safe_list('Comm_Long'),
+            'comm_short': safe_list('Comm_Short'),
+            'noncomm_net_change': safe_list('NonComm_Net_Change'),
+            'comm_net_change': safe_list('Comm_Net_Change'),
+            'oi_change': safe_list('OI_Change'),
         }
 
         return data
@@ -253,6 +351,33 @@ def calculate_cot_metrics(file_path, years=1):
         }
 
 
+def calculate_cot_cached(file_path, years=1):
+    """
+    Calculate COT metrics, serving repeated requests from the result cache.
+
+    Args:
+        file_path: Path to COT CSV file
+        years: Number of years to include (1, 2, or 3)
+
+    Returns:
+        bytes: Serialized JSON result
+    """
+    # The date window is relative to today, so today is part of the key
+    today = datetime.now().strftime('%Y-%m-%d')
+    cache_path = get_cache_path(file_path, 'cot', years)
+    cache_key = get_cache_key(file_path, today)
+    if cache_key is not None:
+        cached = read_cache(cache_path, cache_key)
+        if cached is not None:
+            return cached
+
+    result = calculate_cot_metrics(file_path, years)
+    output = serialize_result(result)
+    if cache_key is not None and result['success']:
+        write_cache(cache_path, cache_key, output)
+    return output
+
+
 def main():
     """CLI entry point"""
     parser = argparse.ArgumentParser(description='COT Data Processing')
@@ -272,10 +397,9 @@ def main():
 
     if args.command == 'fetch':
         result = fetch_cot_data(args.symbol, args.file)
-        print(json.dumps(result))
+        write_output(serialize_result(result))
     elif args.command == 'calculate':
-        result = calculate_cot_metrics(args.file, args.years)
-        print(json.dumps(result))
+        write_output(calculate_cot_cached(args.file, args.years))
     else:
         parser.print_help()
 
@@ -0,0 +1,269 @@
+"""
+Shared I/O helpers for the seasonality and COT sidecars
+Handles CSV tail reads and appends, cache files and JSON output
+"""
+
+import os
+import sys
+import json
+import hashlib
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Optional: pyarrow enables the Parquet mirror of the history CSVs
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+    PARQUET_ERRORS = (OSError, ValueError, pyarrow.ArrowException)
+except ImportError:
+    HAS_PYARROW = False
+    PARQUET_ERRORS = (OSError, ValueError, ImportError)
+
+# Optional: orjson serializes results much faster than the stdlib json module
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+CACHE_DIR_NAME = '.cache'
+# Bump when the cached output format changes to invalidate old entries
+CACHE_VERSION = 1
+# Parquet schema metadata entry holding the mtime and size of the source CSV
+PARQUET_SOURCE_KEY = b'source_csv'
+TAIL_READ_BYTES = 4096
+
+
+def get_cache_path(file_path, namespace, *params):
+    """
+    Build the cache file path for a calculation result.
+
+    There is one entry per data file and parameter set, so a newer result
+    overwrites the stale one instead of accumulating beside it.
+
+    Args:
+        file_path: Path to the CSV file the result is computed from
+        namespace: Cache subdirectory for the calling sidecar (e.g. 'cot')
+        *params: Calculation parameters that select the result
+
+    Returns:
+        Path: Cache file location
+    """
+    file_path = Path(file_path)
+    name = '_'.join([file_path.stem] + [str(p) for p in params])
+    return file_path.parent / CACHE_DIR_NAME / namespace / f'{name}.json'
+
+
+def get_cache_key(file_path, *params):
+    """
+    Build the validity key stored with a cached result.
+
+    The key covers the cache format version and the data file's path, mtime
+    and size, so appending new rows to the file invalidates its results.
+
+    Args:
+        file_path: Path to the CSV file the result is computed from
+        *params: Extra inputs the result depends on (e.g. today's date)
+
+    Returns:
+        bytes: Validity key, or None if the data file is missing
+    """
+    file_path = Path(file_path)
+    try:
+        stat = file_path.stat()
+    except OSError:
+        return None
+
+    raw_key = '|'.join(
+        [str(CACHE_VERSION), str(file_path.resolve()), str(stat.st_mtime_ns), str(stat.st_size)]
+        + [str(p) for p in params]
+    )
+    return hashlib.blake2b(raw_key.encode(), digest_size=16).hexdigest().encode()
+
+
+def read_cache(cache_path, key):
+    """
+    Read a cached result if it was written under the given validity key.
+
+    Args:
+        cache_path: Cache file location from get_cache_path
+        key: Validity key from get_cache_key
+
+    Returns:
+        bytes: Serialized JSON output, or None on a miss
+    """
+    try:
+        with open(cache_path, 'rb') as f:
+            if f.readline().rstrip(b'\n') != key:
+                return None
+            return f.read()
+    except OSError:
+        return None
+
+
+def get_parquet_path(file_path):
+    """Return the location of the Parquet mirror for a CSV data file"""
+    file_path = Path(file_path)
+    return file_path.parent / CACHE_DIR_NAME / 'parquet' / f'{file_path.stem}.parquet'
+
+
+def serialize_result(result):
+    """
+    Serialize a command result to newline-terminated JSON.
+
+    Args:
+        result: JSON-serializable dict
+
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    if HAS_ORJSON:
+        return orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(result) + '\n').encode()
+
+
+def write_output(output):
+    """Write serialized JSON bytes to stdout"""
+    sys.stdout.buffer.write(output)
+    sys.stdout.buffer.flush()
+
+
+def write_cache(cache_path, key, output):
+    """Atomically write serialized JSON output and its key to the cache, ignoring I/O errors"""
+    tmp_path = None
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(key + b'\n')
+            f.write(output)
+        os.replace(tmp_path, cache_path)
+        tmp_path = None
+    except OSError:
+        pass
+    finally:
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+
+def write_parquet(df, parquet_path, source_key):
+    """Atomically write a DataFrame and its source key to Parquet, ignoring I/O and Arrow errors"""
+    tmp_path = None
+    try:
+        parquet_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=parquet_path.parent, suffix='.tmp')
+        os.close(fd)
+        table = pyarrow.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[PARQUET_SOURCE_KEY] = source_key
+        pq.write_table(table.replace_schema_metadata(metadata), tmp_path, compression='zstd')
+        os.replace(tmp_path, parquet_path)
+        tmp_path = None
+    except PARQUET_ERRORS:
+        pass
+    finally:
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+
+def read_with_parquet_mirror(file_path, read_csv, columns=None):
+    """
+    Load a CSV data file, going through its Parquet mirror when possible.
+
+    The CSV remains the source of truth. When pyarrow is available, a Parquet
+    mirror is kept in the cache directory and read instead of the CSV. The
+    mirror stores the mtime and size the CSV had when it was read, and is
+    only used while they still match exactly; otherwise it is rebuilt.
+
+    Args:
+        file_path: Path to the CSV file
+        read_csv: Callable parsing the CSV at a given path into a DataFrame
+        columns: Columns to read from the mirror, or None for all
+
+    Returns:
+        DataFrame: Parsed file contents
+    """
+    file_path = Path(file_path)
+    if not HAS_PYARROW:
+        return read_csv(file_path)
+
+    # Stat before reading, so rows appended mid-read invalidate the mirror
+    stat = file_path.stat()
+    source_key = f'{stat.st_mtime_ns}:{stat.st_size}'.encode()
+    parquet_path = get_parquet_path(file_path)
+
+    try:
+        table = pq.read_table(parquet_path, columns=columns)
+        if (table.schema.metadata or {}).get(PARQUET_SOURCE_KEY) == source_key:
+            return table.to_pandas()
+    except PARQUET_ERRORS:
+        # Missing or unreadable mirror, rebuild it from the CSV
+        pass
+
+    df = read_csv(file_path)
+    write_parquet(df, parquet_path, source_key)
+    return df
+
+
+def read_last_date(file_path):
+    """
+    Read the date of the last row of a CSV without parsing the whole file.
+
+    Rows are appended in date order, so the last line holds the latest date.
+    The date must be the first column.
+
+    Args:
+        file_path: Path to the CSV file
+
+    Returns:
+        datetime: Date of the last row, or None if the file has no data rows
+    """
+    with open(file_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - TAIL_READ_BYTES, 0))
+        lines = [line for line in f.read().splitlines() if line.strip()]
+
+    if not lines:
+        return None
+
+    date_field = lines[-1].split(b',', 1)[0].decode().strip('"')
+    if date_field == 'Date':
+        # Header only
+        return None
+    return datetime.fromisoformat(date_field)
+
+
+def append_csv_rows(df, file_path):
+    """
+    Append rows to an existing CSV without going through DataFrame.to_csv.
+
+    Appends are only a few rows, so formatting them directly avoids the
+    writer setup cost of to_csv. Output matches to_csv(header=False,
+    index=False) for frames of numbers and dates.
+
+    Args:
+        df: Rows to append, columns in file order
+        file_path: Path to the CSV file
+    """
+    columns = []
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            columns.append(np.datetime_as_string(values.to_numpy(dtype='datetime64[D]'), unit='D').tolist())
+        else:
+            missing = values.isna().tolist()
+            columns.append(['' if is_missing else str(v) for v, is_missing in zip(values.tolist(), missing)])
+
+    with open(file_path, 'a') as f:
+        f.write(''.join(','.join(row) + '\n' for row in zip(*columns)))
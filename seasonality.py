@@ -9,6 +9,7 @@ import json
 import argparse
 import warnings
 from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 
 # Suppress all warnings to ensure clean JSON output
@@ -18,6 +19,153 @@ import pandas as pd
 import numpy as np
 import yfinance as yf
 
+from data_io import (
+    HAS_PYARROW, get_cache_path, get_cache_key, read_cache, write_cache, read_with_parquet_mirror,
+    serialize_result, write_output, read_last_date, append_csv_rows
+)
+
+LOADER_CACHE_SIZE = 32
+PRICE_COLUMNS = ['Date', 'Close']
+DAYS_IN_YEAR = 365
+SMOOTHING_WINDOW = 7
+MAX_YEARS_BACK = 10
+
+
+def load_price_history(file_path):
+    """
+    Load the Date and Close columns of a price history file.
+
+    Parsed frames are kept in an LRU cache keyed on the file's path, mtime and
+    size, so a long-running process (see serve) reuses them until the file
+    changes. Callers must not modify the returned DataFrame in place.
+
+    Args:
+        file_path: Path to the CSV file containing price history
+
+    Returns:
+        DataFrame: Price history with a datetime 'Date' column
+    """
+    file_path = Path(file_path).resolve()
+    stat = file_path.stat()
+    return _load_price_history(str(file_path), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=LOADER_CACHE_SIZE)
+def _load_price_history(path, mtime_ns, size):
+    """
+    Parse a price history file for load_price_history.
+
+    Args:
+        path: Resolved path to the CSV file containing price history
+        mtime_ns: File modification time in nanoseconds (cache key only)
+        size: File size in bytes (cache key only)
+
+    Returns:
+        DataFrame: Price history with a datetime 'Date' column
+    """
+    return read_with_parquet_mirror(path, _read_price_csv, columns=PRICE_COLUMNS)
+
+
+def _read_price_csv(file_path):
+    """Parse the Date and Close columns of a price history CSV"""
+    # Only Date and Close are used, so skip parsing the other OHLCV columns
+    read_kwargs = {
+        'usecols': PRICE_COLUMNS,
+        'parse_dates': ['Date'],
+        'dtype': {'Close': 'float64'},
+    }
+
+    if HAS_PYARROW:
+        # Arrow's CSV reader parses on multiple threads
+        return pd.read_csv(file_path, engine='pyarrow', **read_kwargs)
+
+    return pd.read_csv(file_path, engine='c', memory_map=True, **read_kwargs)
+
+
+def to_daily_array(by_day, fill_edges):
+    """
+    Scatter values onto a 365-day array and linearly interpolate between known days.
+
+    Args:
+        by_day: Series of values indexed by day of year, sorted ascending
+        fill_edges: If True, days before the first known value are 0 and days
+            after the last known value repeat it. Otherwise they are left NaN.
+
+    Returns:
+        ndarray: Array of 365 floats for days 1-365
+    """
+    days = by_day.index.to_numpy()
+    values = by_day.to_numpy(dtype=np.float64)
+    known = (days <= DAYS_IN_YEAR) & ~np.isnan(values)
+    days, values = days[known], values[known]
+
+    all_days = np.arange(1, DAYS_IN_YEAR + 1)
+    if len(days) == 0:
+        return np.zeros(DAYS_IN_YEAR) if fill_edges else np.full(DAYS_IN_YEAR, np.nan)
+
+    if fill_edges:
+        return np.interp(all_days, days, values, left=0.0)
+    return np.interp(all_days, days, values, left=np.nan, right=np.nan)
+
+
+def accumulate_pct_by_day(close, year_index, day_of_year, n_years):
+    """
+    Sum each year's cumulative percentage change from its first close by year and day of year.
+
+    Rows must be sorted by year, then day of year.
+
+    Args:
+        close: float64 array of closing prices without NaNs
+        year_index: int64 array of years as offsets from the first year (0 to n_years - 1)
+        day_of_year: int64 array of days of year (1-366)
+        n_years: Number of years covered
+
+    Returns:
+        tuple: (sums, counts) float64 arrays of shape (n_years, 367)
+    """
+    n_days = DAYS_IN_YEAR + 2
+    if close.size == 0:
+        return np.zeros((n_years, n_days)), np.zeros((n_years, n_days))
+
+    year_starts = np.concatenate(([0], np.flatnonzero(np.diff(year_index)) + 1))
+    year_lengths = np.diff(np.append(year_starts, close.size))
+    first_close = np.repeat(close[year_starts], year_lengths)
+
+    pct_change = (close / first_close - 1.0) * 100.0
+    cells = year_index * n_days + day_of_year
+    sums = np.bincount(cells, weights=pct_change, minlength=n_years * n_days)
+    counts = np.bincount(cells, minlength=n_years * n_days).astype(np.float64)
+    return sums.reshape(n_years, n_days), counts.reshape(n_years, n_days)
+
+
+def centered_rolling_mean(values, window):
+    """
+    Centered rolling mean using prefix sums.
+
+    Windows are truncated at the array edges and averaged over the values
+    they contain, matching pandas rolling(center=True, min_periods=1).
+
+    Args:
+        values: 1-D array without NaNs
+        window: Odd window length
+
+    Returns:
+        ndarray: Smoothed array of the same length
+    """
+    n = len(values)
+    half = window // 2
+    csum = np.concatenate(([0.0], np.cumsum(values)))
+
+    positions = np.arange(n)
+    lo = np.maximum(positions - half, 0)
+    hi = np.minimum(positions + half + 1, n)
+    return (csum[hi] - csum[lo]) / (hi - lo)
+
+
+def nan_to_none(values):
+    """Convert a float array to a list with NaN replaced by None"""
+    return np.where(np.isnan(values), None, values).tolist()
+
 
 def fetch_data(symbol, file_path):
     """
@@ -34,14 +182,22 @@ def fetch_data(symbol, file_path):
         file_path = Path(file_path)
 
         # Determine start date
-        if file_path.exists() and file_path.stat().st_size > 0:
-            # Read existing data to find the last date
-            existing_df = pd.read_csv(file_path, parse_dates=['Date'])
-            last_date = existing_df['Date'].max()
+        last_date = None
+        modified_today = False
+        if file_path.exists():
+            stat = file_path.stat()
+            if stat.st_size > 0:
+                # Read only the end of the file to find the last date
+                last_date = read_last_date(file_path)
+                # Fetches stop before today, so a file written today already has
+                # every row Yahoo Finance can return until tomorrow
+                modified_today = datetime.fromtimestamp(stat.st_mtime).date() == datetime.now().date()
+
+        if last_date is not None:
             fetch_start_date = (last_date + timedelta(days=1)).strftime('%Y-%m-%d')
 
-            # If last date is today or in the future, no update needed
-            if last_date.date() >= datetime.now().date():
+            # If the file was updated today or last date is today or later, no update needed
+            if modified_today or last_date.date() >= datetime.now().date():
                 return {
                     'success': True,
                     'message': 'Data is already up to date',
@@ -51,7 +207,6 @@ def fetch_data(symbol, file_path):
         else:
             # No existing data, fetch from 2000
             fetch_start_date = '2000-01-01'
-            existing_df = None
 
         # Fetch data from Yahoo Finance
         today = datetime.now().strftime('%Y-%m-%d')
@@ -71,13 +226,13 @@ def fetch_data(symbol, file_path):
         new_data['Date'] = pd.to_datetime(new_data['Date']).dt.date
 
         # Save or append to CSV
-        if existing_df is None:
+        if last_date is None:
             # Create new file
             new_data.to_csv(file_path, index=False)
             rows_added = len(new_data)
         else:
             # Append new data
-            new_data.to_csv(file_path, mode='a', header=False, index=False)
+            append_csv_rows(new_data, file_path)
             rows_added = len(new_data)
 
         last_date = new_data['Date'].max().strftime('%Y-%m-%d')
@@ -118,7 +273,7 @@ def calculate_metrics(file_path, target_year):
             }
 
         # Load data
-        df = pd.read_csv(file_path, parse_dates=['Date'])
+        df = load_price_history(file_path)
         df = df.sort_values('Date')
 
         # Filter to historical window (all data before target year)
@@ -138,53 +293,42 @@ def calculate_metrics(file_path, target_year):
         # Get the last N years of data
         latest_year = historical_df['Year'].max()
 
-        # Calculate normalized percentage changes for each period
-        def normalize_years(years_back):
-            """Normalize each year's data to percentage change from Day 1"""
-            start_year = latest_year - years_back + 1
-            period_df = historical_df[historical_df['Year'] >= start_year].copy()
-
-            normalized_data = []
-
-            for year in period_df['Year'].unique():
-                year_data = period_df[period_df['Year'] == year].copy()
-                year_data = year_data.sort_values('DayOfYear')
-
-                if len(year_data) == 0:
-                    continue
-
-                # Calculate cumulative percentage change from first day
-                first_close = year_data.iloc[0]['Close']
-                year_data['PctChange'] = (year_data['Close'] / first_close - 1) * 100
-
-                normalized_data.append(year_data[['DayOfYear', 'PctChange']])
+        # Normalize each year in the longest period to percentage change from Day 1 in one pass;
+        # shorter periods reuse its most recent years
+        first_year = latest_year - MAX_YEARS_BACK + 1
+        window_df = historical_df[(historical_df['Year'] >= first_year) & historical_df['Close'].notna()]
+        window_df = window_df.sort_values(['Year', 'DayOfYear'])
+        year_sums, year_counts = accumulate_pct_by_day(
+            window_df['Close'].to_numpy(dtype=np.float64),
+            window_df['Year'].to_numpy(dtype=np.int64) - first_year,
+            window_df['DayOfYear'].to_numpy(dtype=np.int64),
+            MAX_YEARS_BACK
+        )
 
-            if not normalized_data:
-                return []
+        def normalize_years(years_back):
+            """Average the last years_back normalized years by day of year"""
+            sums = year_sums[-years_back:].sum(axis=0)
+            counts = year_counts[-years_back:].sum(axis=0)
 
-            # Combine all years and average by day of year
-            combined = pd.concat(normalized_data)
-            avg_by_day = combined.groupby('DayOfYear')['PctChange'].mean()
+            # Average across years by day of year
+            known = counts > 0
+            avg_by_day = pd.Series(sums[known] / counts[known], index=np.flatnonzero(known))
 
             # Create full 365-day array, filling missing days with interpolation
-            full_days = pd.Series(index=range(1, 366), dtype=float)
-            full_days.update(avg_by_day)
-            full_days = full_days.interpolate(method='linear').fillna(0)
+            full_days = to_daily_array(avg_by_day, fill_edges=True)
 
             # Apply 7-day rolling average to smooth the seasonal pattern
-            full_days = full_days.rolling(window=7, center=True, min_periods=1).mean()
-
-            return full_days.tolist()
+            return centered_rolling_mean(full_days, SMOOTHING_WINDOW)
 
         # Calculate averages for different periods
-        avg_2yr = normalize_years(2) if latest_year >= (target_year - 2) else []
-        avg_5yr = normalize_years(5) if latest_year >= (target_year - 5) else []
-        avg_6yr = normalize_years(6) if latest_year >= (target_year - 6) else []
-        avg_10yr = normalize_years(10) if latest_year >= (target_year - 10) else []
+        avg_2yr = normalize_years(2) if latest_year >= (target_year - 2) else np.array([])
+        avg_5yr = normalize_years(5) if latest_year >= (target_year - 5) else np.array([])
+        avg_6yr = normalize_years(6) if latest_year >= (target_year - 6) else np.array([])
+        avg_10yr = normalize_years(10) if latest_year >= (target_year - 10) else np.array([])
 
         # Get actual data for target year
         target_df = df[df['Date'].dt.year == target_year].copy()
-        actual = []
+        actual = np.array([])
 
         if len(target_df) > 0:
             target_df = target_df.sort_values('Date')
@@ -194,20 +338,17 @@ def calculate_metrics(file_path, target_year):
 
             # Create full 365-day array for actual data - NO interpolation into future
             actual_by_day = target_df.set_index('DayOfYear')['PctChange']
-            full_actual = pd.Series(index=range(1, 366), dtype=float)
-            full_actual.update(actual_by_day)
             # Only interpolate between existing data points, not into future
-            full_actual = full_actual.interpolate(method='linear', limit_area='inside')
-            actual = full_actual.tolist()
+            actual = to_daily_array(actual_by_day, fill_edges=False)
 
         # Convert NaN to None for valid JSON
         return {
             'success': True,
-            'avg_2yr': [None if pd.isna(x) else x for x in avg_2yr],
-            'avg_5yr': [None if pd.isna(x) else x for x in avg_5yr],
-            'avg_6yr': [None if pd.isna(x) else x for x in avg_6yr],
-            'avg_10yr': [None if pd.isna(x) else x for x in avg_10yr],
-            'actual': [None if pd.isna(x) else x for x in actual],
+            'avg_2yr': nan_to_none(avg_2yr),
+            'avg_5yr': nan_to_none(avg_5yr),
+            'avg_6yr': nan_to_none(avg_6yr),
+            'avg_10yr': nan_to_none(avg_10yr),
+            'actual': nan_to_none(actual),
             'target_year': target_year
         }
 
@@ -218,6 +359,65 @@ def calculate_metrics(file_path, target_year):
         }
 
 
+def calculate_cached(file_path, target_year):
+    """
+    Calculate seasonality metrics, serving repeated requests from the result cache.
+
+    Args:
+        file_path: Path to the CSV file containing price history
+        target_year: The year to analyze (int)
+
+    Returns:
+        bytes: Serialized JSON result
+    """
+    cache_path = get_cache_path(file_path, 'seasonality', target_year)
+    cache_key = get_cache_key(file_path)
+    if cache_key is not None:
+        cached = read_cache(cache_path, cache_key)
+        if cached is not None:
+            return cached
+
+    result = calculate_metrics(file_path, target_year)
+    output = serialize_result(result)
+    if cache_key is not None and result['success']:
+        write_cache(cache_path, cache_key, output)
+    return output
+
+
+def serve():
+    """
+    Answer requests read as JSON lines from stdin until EOF.
+
+    Each line is an object with a 'command' ('fetch' or 'calculate') and the
+    same arguments as the CLI ('symbol', 'file', 'year'). Each response is
+    written as one JSON line. Keeping a single process alive lets
+    load_price_history reuse parsed files across requests.
+    """
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+
+        try:
+            request = json.loads(line)
+            command = request.get('command')
+            if command == 'fetch':
+                output = serialize_result(fetch_data(request['symbol'], request['file']))
+            elif command == 'calculate':
+                output = calculate_cached(request['file'], int(request['year']))
+            else:
+                output = serialize_result({
+                    'success': False,
+                    'message': f'Unknown command: {command}'
+                })
+        except Exception as e:
+            output = serialize_result({
+                'success': False,
+                'message': f'Invalid request: {str(e)}'
+            })
+
+        write_output(output)
+
+
 def main():
     """CLI entry point"""
     parser = argparse.ArgumentParser(description='Seasonality Data Processing Engine')
@@ -233,14 +433,18 @@ def main():
     calc_parser.add_argument('--file', required=True, help='Path to CSV file')
     calc_parser.add_argument('--year', required=True, type=int, help='Target year for analysis')
 
+    # Serve command
+    subparsers.add_parser('serve', help='Answer JSON-line requests from stdin until EOF')
+
     args = parser.parse_args()
 
     if args.command == 'fetch':
         result = fetch_data(args.symbol, args.file)
-        print(json.dumps(result))
+        write_output(serialize_result(result))
     elif args.command == 'calculate':
-        result = calculate_metrics(args.file, args.year)
-        print(json.dumps(result))
+        write_output(calculate_cached(args.file, args.year))
+    elif args.command == 'serve':
+        serve()
     else:
         parser.print_help()
         sys.exit(1)